@@ -1,12 +1,19 @@
-import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timezone
+import orjson
 import requests
+from requests.adapters import HTTPAdapter, Retry
 
 STATE_FILE = Path("adv_watch_state.json")
 
-CRD = 307151
-PDF_URL = f"https://reports.adviserinfo.sec.gov/reports/ADV/{CRD}/PDF/{CRD}.pdf"
+# State key -> CRD number
+FIRMS = {
+    "elliott": 307151,
+}
+PDF_URL = "https://reports.adviserinfo.sec.gov/reports/ADV/{crd}/PDF/{crd}.pdf"
 
 HEADERS = {
     "User-Agent": (
@@ -16,62 +23,134 @@ HEADERS = {
     )
 }
 
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+        respect_retry_after_header=True,
+    ),
+))
+
+_UTC = timezone.utc
+
 def utc_now():
-    return datetime.now(timezone.utc).isoformat()
+    return datetime.now(_UTC).isoformat(timespec="seconds")
 
 def load_state():
     if STATE_FILE.exists():
-        return json.loads(STATE_FILE.read_text())
+        return orjson.loads(STATE_FILE.read_bytes())
     return {}
 
 def save_state(state):
-    STATE_FILE.write_text(json.dumps(state, indent=2, sort_keys=True))
+    data = orjson.dumps(state, option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2)
+    if STATE_FILE.exists() and STATE_FILE.read_bytes() == data:
+        return
+    tmp = STATE_FILE.with_suffix(".json.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, STATE_FILE)
+
+def probe_pdf(session: requests.Session, url: str, headers: dict | None = None) -> dict | None:
+    # Use a one-byte ranged GET rather than HEAD: CDNs that strip validators on
+    # HEAD still send them here, and Content-Range carries the full size. The
+    # body is never read. Returns None on 304 Not Modified.
+    headers = {**(headers or {}), "Accept": "application/pdf, */*;q=0.1", "Range": "bytes=0-0"}
+    with session.get(url, headers=headers, timeout=30, allow_redirects=True, stream=True) as r:
+        if r.status_code == 304:
+            return None
+        r.raise_for_status()
+        h = r.headers
+        if r.status_code == 206:
+            total = h.get("Content-Range", "").rpartition("/")[2]
+            content_length = total if total.isdigit() else None
+        else:
+            content_length = h.get("Content-Length")
+        return {
+            "etag": h.get("ETag"),
+            "last_modified": h.get("Last-Modified"),
+            "content_length": content_length,
+            "content_type": h.get("Content-Type"),
+            "final_url": r.url,
+            # A 206 only reflects our Range header; record it as the full fetch
+            "status_code": 200 if r.status_code == 206 else r.status_code,
+        }
 
-def head_pdf(url: str) -> dict:
-    r = requests.head(url, headers=HEADERS, timeout=30, allow_redirects=True)
-    r.raise_for_status()
-    h = r.headers
+def check_firm(crd: int, prev: dict, session: requests.Session = SESSION) -> dict | Exception | None:
+    pdf_url = PDF_URL.format(crd=crd)
+
+    # Let the server validate against what we stored last time
+    prev_headers = prev.get("headers", {})
+    cond = {}
+    if prev_headers.get("etag"):
+        cond["If-None-Match"] = prev_headers["etag"]
+    if prev_headers.get("last_modified"):
+        cond["If-Modified-Since"] = prev_headers["last_modified"]
+
+    # Errors are returned rather than raised so one failing firm doesn't
+    # discard the results of the others
+    try:
+        cur = probe_pdf(session, pdf_url, headers=cond)
+    except Exception as e:
+        return e
+    if cur is None:
+        return None
+
+    # Prefer ETag; fallback to Last-Modified; fallback to Content-Length
     return {
-        "etag": h.get("ETag"),
-        "last_modified": h.get("Last-Modified"),
-        "content_length": h.get("Content-Length"),
-        "content_type": h.get("Content-Type"),
-        "final_url": str(r.url),
-        "status_code": r.status_code,
+        "last_checked_utc": utc_now(),
+        "pdf_url": pdf_url,
+        "sig": cur.get("etag") or cur.get("last_modified") or cur.get("content_length"),
+        "headers": cur,
     }
 
 def main():
     state = load_state()
-    prev = state.get("elliott", {})
 
-    cur = head_pdf(PDF_URL)
+    # Requests run in parallel over the shared session; state is only touched
+    # back on the main thread once every firm has been checked
+    with ThreadPoolExecutor(max_workers=10) as ex:
+        results = list(ex.map(check_firm, FIRMS.values(), (state.get(n, {}) for n in FIRMS)))
 
-    # Prefer ETag; fallback to Last-Modified; fallback to Content-Length
-    cur_sig = cur.get("etag") or cur.get("last_modified") or cur.get("content_length")
-    prev_sig = prev.get("sig")
+    changes = []
+    failed = []
+    for name, cur in zip(FIRMS, results):
+        if isinstance(cur, Exception):
+            print(f"{name}: ERROR: {cur!r}", file=sys.stderr)
+            failed.append(name)
+            continue
+        if cur is None:
+            print(f"{name}: NO CHANGE")
+            continue
+
+        prev_sig = state.get(name, {}).get("sig")
+        cur_sig = cur["sig"]
+        state[name] = cur
+
+        if prev_sig is None:
+            print(f"{name}: First run baseline stored: {cur_sig}")
+        elif cur_sig != prev_sig:
+            changes.append(
+                f"{name.title()} ADV PDF changed\n"
+                f"Previous signature: {prev_sig}\n"
+                f"Current signature : {cur_sig}\n"
+                f"PDF URL: {cur['pdf_url']}\n"
+            )
+            print(f"{name}: CHANGED")
+        else:
+            print(f"{name}: NO CHANGE")
 
-    state["elliott"] = {
-        "last_checked_utc": utc_now(),
-        "pdf_url": PDF_URL,
-        "sig": cur_sig,
-        "headers": cur,
-    }
     save_state(state)
 
-    if prev_sig is None:
-        print(f"First run baseline stored: {cur_sig}")
-        return
+    if changes:
+        Path("CHANGED.txt").write_text("\n".join(changes))
 
-    if cur_sig != prev_sig:
-        Path("CHANGED.txt").write_text(
-            "Elliott ADV PDF changed\n"
-            f"Previous signature: {prev_sig}\n"
-            f"Current signature : {cur_sig}\n"
-            f"PDF URL: {PDF_URL}\n"
-        )
-        print("CHANGED")
-    else:
-        print("NO CHANGE")
+    if failed:
+        sys.exit(f"Check failed for: {', '.join(failed)}")
 
 if __name__ == "__main__":
     main()